@@ -1,11 +1,543 @@
+import json
+import math
+import os
 import random
+import sqlite3
 import tkinter as tk
+from datetime import datetime
+from statistics import NormalDist
 from tkinter import ttk, messagebox
 
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.lines import Line2D  # 导入Line2D用于自定义图例
 
+# 货币政策：名称 -> (指标变化, 效果说明)
+MONETARY_POLICIES = {
+    "提高利率": ({"interest_rate": 0.5, "inflation_rate": -0.7, "unemployment_rate": 0.4,
+                  "gdp_growth": -0.3, "popular_support": -2},
+                 "提高利率 0.5%。这抑制了通货膨胀，但导致失业率上升和经济增长放缓。"),
+    "降低利率": ({"interest_rate": -0.5, "inflation_rate": 0.7, "unemployment_rate": -0.4,
+                  "gdp_growth": 0.3, "popular_support": 2},
+                 "降低利率 0.5%。这刺激了经济增长和通货膨胀，同时降低了失业率。"),
+    "增加货币供应": ({"inflation_rate": 1.0, "unemployment_rate": -0.6, "gdp_growth": 0.5,
+                      "popular_support": 3},
+                     "增加货币供应。这刺激了经济增长，降低了失业率，但加剧了通货膨胀。"),
+    "减少货币供应": ({"inflation_rate": -1.0, "unemployment_rate": 0.6, "gdp_growth": -0.5,
+                      "popular_support": -3},
+                     "减少货币供应。这抑制了通货膨胀，但导致失业率上升和经济增长放缓。"),
+    "量化宽松": ({"inflation_rate": 0.8, "unemployment_rate": -0.5, "gdp_growth": 0.4,
+                  "popular_support": 2},
+                 "实施量化宽松政策。这增加了市场流动性，刺激了经济增长，但也可能引发通货膨胀。"),
+    "保持不变": ({}, "保持货币政策不变。")
+}
+
+# 财政政策：名称 -> (指标变化, 效果说明)
+FISCAL_POLICIES = {
+    "增加政府支出": ({"budget_balance": -5, "gdp_growth": 0.5, "unemployment_rate": -0.3,
+                      "inflation_rate": 0.5, "popular_support": 3},
+                     "增加政府支出 50 亿。这刺激了经济增长，降低了失业率，但增加了通货膨胀和预算赤字。"),
+    "减少政府支出": ({"budget_balance": 5, "gdp_growth": -0.5, "unemployment_rate": 0.3,
+                      "inflation_rate": -0.5, "popular_support": -3},
+                     "减少政府支出 50 亿。这减少了预算赤字和通货膨胀，但导致经济增长放缓和失业率上升。"),
+    "增加税收": ({"budget_balance": 7, "gdp_growth": -0.4, "inflation_rate": -0.4,
+                  "popular_support": -4},
+                 "增加税收 70 亿。这增加了预算盈余并抑制了通货膨胀，但导致经济增长放缓。"),
+    "减少税收": ({"budget_balance": -7, "gdp_growth": 0.4, "inflation_rate": 0.4,
+                  "popular_support": 4},
+                 "减少税收 70 亿。这刺激了经济增长和通货膨胀，但增加了预算赤字。"),
+    "结构性减税": ({"budget_balance": -3, "gdp_growth": 0.3, "unemployment_rate": -0.2,
+                    "popular_support": 2},
+                   "实施结构性减税。这促进了特定产业的发展，提高了生产效率，对经济增长和就业有积极影响。"),
+    "保持不变": ({}, "保持财政政策不变。")
+}
+
+# 随机事件：(名称, 说明, 指标变化)
+RANDOM_EVENTS = [
+    ("国际油价上涨", "这导致国内能源价格上升，推高了通货膨胀率。",
+     {"inflation_rate": 1.2, "gdp_growth": -0.3}),
+    ("技术突破", "这提高了生产效率，促进了经济增长并降低了失业率。",
+     {"gdp_growth": 0.8, "unemployment_rate": -0.5}),
+    ("贸易战升级", "这阻碍了国际贸易，导致经济增长放缓。",
+     {"gdp_growth": -0.6, "inflation_rate": 0.5}),
+    ("消费者信心增强", "这刺激了消费，促进了经济增长。",
+     {"gdp_growth": 0.7, "unemployment_rate": -0.3}),
+    ("自然灾害", "这破坏了基础设施，导致经济增长放缓。",
+     {"gdp_growth": -0.5, "budget_balance": -3}),
+    ("央行注入流动性", "这降低了市场利率，刺激了投资。",
+     {"interest_rate": -0.4, "gdp_growth": 0.4}),
+    ("房地产市场繁荣", "这刺激了相关产业，促进了经济增长。",
+     {"gdp_growth": 0.6, "inflation_rate": 0.4}),
+    ("股市崩盘", "这导致消费者信心下降，经济增长放缓。",
+     {"gdp_growth": -0.7, "popular_support": -5}),
+    ("金融危机", "这导致信贷紧缩，经济增长停滞。",
+     {"gdp_growth": -1.0, "unemployment_rate": 1.0}),
+    ("全球疫情爆发", "这导致供应链中断，经济增长大幅放缓。",
+     {"gdp_growth": -1.5, "unemployment_rate": 1.5, "popular_support": -8}),
+    ("汇率波动", "本币升值影响出口，导致贸易收支变化。",
+     {"gdp_growth": -0.2}),
+    ("新兴市场危机", "全球资本流动变化，影响国内金融市场。",
+     {"interest_rate": 0.5, "budget_balance": -1}),
+    ("无事件", "本回合经济运行平稳，没有重大事件发生。", {})
+]
+
+RISK_ASSESSMENT_SAMPLES = 20000
+
+ARCHIVE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "game_archive.db")
+
+DEFAULT_ECONOMIC_TARGETS = {
+    "inflation": (1.0, 3.0),
+    "unemployment": (3.0, 6.0),
+    "gdp_growth": (2.0, 4.0),
+    "budget": (-20, 20),
+    "support": (60, 100)
+}
+
+INITIAL_STATE = {
+    "inflation_rate": 2.0,
+    "unemployment_rate": 5.0,
+    "interest_rate": 4.0,
+    "gdp_growth": 2.5,
+    "budget_balance": 0,
+    "popular_support": 50
+}
+
+
+def random_event_weights(economic_health, inflation_rate):
+    event_weights = [1.0] * len(RANDOM_EVENTS)
+
+    if economic_health == "衰退":
+        event_weights[0] = 1.5
+        event_weights[2] = 1.5
+        event_weights[4] = 1.5
+        event_weights[7] = 1.5
+        event_weights[8] = 1.5
+        event_weights[9] = 1.2
+        event_weights[10] = 0.8
+        event_weights[11] = 1.3
+    elif inflation_rate > 5:
+        event_weights[0] = 1.5
+        event_weights[2] = 1.2
+        event_weights[5] = 0.8
+
+    return event_weights
+
+
+def assess_economic_health(state, targets):
+    health_score = 0
+
+    if targets["inflation"][0] <= state["inflation_rate"] <= targets["inflation"][1]:
+        health_score += 1
+    elif state["inflation_rate"] < targets["inflation"][0]:
+        health_score -= 0.5
+    else:
+        health_score -= 1
+
+    if targets["unemployment"][0] <= state["unemployment_rate"] <= targets["unemployment"][1]:
+        health_score += 1
+    elif state["unemployment_rate"] > targets["unemployment"][1]:
+        health_score -= 1
+
+    if targets["gdp_growth"][0] <= state["gdp_growth"] <= targets["gdp_growth"][1]:
+        health_score += 1
+    elif state["gdp_growth"] < targets["gdp_growth"][0]:
+        health_score -= 1
+
+    if targets["budget"][0] <= state["budget_balance"] <= targets["budget"][1]:
+        health_score += 0.5
+    elif state["budget_balance"] < targets["budget"][0]:
+        health_score -= 0.5
+
+    if state["popular_support"] >= targets["support"][0]:
+        health_score += 0.5
+    else:
+        health_score -= 0.5
+
+    if health_score >= 3:
+        return "健康", "#27ae60"
+    elif health_score >= 1.5:
+        return "稳定", "#f39c12"
+    return "衰退", "#e74c3c"
+
+
+def game_over_cause(state):
+    if state["popular_support"] <= 0:
+        return "支持率归零"
+    if state["inflation_rate"] > 15 or state["unemployment_rate"] > 15:
+        return "经济衰退"
+    return None
+
+
+def apply_effects(state, effects):
+    for attr, value in effects.items():
+        state[attr] += value
+
+
+def danger_level(state):
+    # 距离失败的程度，达到1即触发游戏失败
+    return max(state["inflation_rate"] / 15, state["unemployment_rate"] / 15,
+               1 - state["popular_support"] / 100)
+
+
+def play_round(state, economic_health, monetary_policy, fiscal_policy, rng, tilt_factors=None):
+    # 推演一个回合：政策效果、菲利普斯曲线扰动和随机事件，直接修改 state。
+    # 事件按 tilt_factors 倾斜后的分布抽取，返回 (事件序号, 对数似然比, 原始事件概率)。
+    apply_effects(state, MONETARY_POLICIES[monetary_policy][0])
+    apply_effects(state, FISCAL_POLICIES[fiscal_policy][0])
+
+    phillips_effect = rng.uniform(-0.3, 0.3)
+    state["inflation_rate"] += phillips_effect
+    state["unemployment_rate"] -= phillips_effect * 0.5
+
+    weights = random_event_weights(economic_health, state["inflation_rate"])
+    weight_sum = sum(weights)
+    probabilities = [w / weight_sum for w in weights]
+    if tilt_factors is None:
+        index = rng.choices(range(len(RANDOM_EVENTS)), weights=weights, k=1)[0]
+        log_ratio = 0.0
+    else:
+        tilted = [w * f for w, f in zip(weights, tilt_factors)]
+        index = rng.choices(range(len(RANDOM_EVENTS)), weights=tilted, k=1)[0]
+        log_ratio = math.log(probabilities[index]) - math.log(tilted[index] / sum(tilted))
+    apply_effects(state, RANDOM_EVENTS[index][2])
+
+    return index, log_ratio, probabilities
+
+
+def round_game_over_cause(state, round_number, max_rounds):
+    # 最后一回合结束后直接结算，不再判定失败
+    if round_number >= max_rounds:
+        return None
+    return game_over_cause(state)
+
+
+def simulate_policy_path(policy_plan, state, start_round, max_rounds, economic_health, targets,
+                         tilt_factors, rng):
+    # 按倾斜后的事件分布模拟一局剩余回合，同时累计相对原始分布的对数似然比
+    state = dict(state)
+    health = economic_health
+    log_ratio = 0.0
+    danger = 0.0
+    cause = None
+    event_counts = [0] * len(RANDOM_EVENTS)
+    expected_counts = [0.0] * len(RANDOM_EVENTS)
+
+    for offset, (monetary_policy, fiscal_policy) in enumerate(policy_plan):
+        index, round_log_ratio, probabilities = play_round(state, health, monetary_policy, fiscal_policy,
+                                                           rng, tilt_factors)
+        log_ratio += round_log_ratio
+        event_counts[index] += 1
+        for i, probability in enumerate(probabilities):
+            expected_counts[i] += probability
+
+        health = assess_economic_health(state, targets)[0]
+        if start_round + offset < max_rounds:
+            danger = max(danger, danger_level(state))
+        cause = round_game_over_cause(state, start_round + offset, max_rounds)
+        if cause:
+            break
+
+    return {
+        "cause": cause,
+        "log_ratio": log_ratio,
+        "danger": danger,
+        "event_counts": event_counts,
+        "expected_counts": expected_counts
+    }
+
+
+def fit_event_tilt(policy_plan, state, start_round, max_rounds, economic_health, targets, rng,
+                   n_pilot=1000, iterations=6, elite_fraction=0.1, smoothing=0.7, min_tilt=0.05):
+    # 交叉熵法：用每轮最接近失败的精英路径更新各事件的倾斜倍数，
+    # 逐步把抽样分布推向导致失败的事件组合
+    tilt_factors = [1.0] * len(RANDOM_EVENTS)
+
+    for _ in range(iterations):
+        paths = [simulate_policy_path(policy_plan, state, start_round, max_rounds, economic_health,
+                                      targets, tilt_factors, rng)
+                 for _ in range(n_pilot)]
+        paths.sort(key=lambda path: path["danger"], reverse=True)
+        level = min(1.0, paths[max(0, int(n_pilot * elite_fraction) - 1)]["danger"])
+        elite = [path for path in paths if path["danger"] >= level]
+
+        max_log_ratio = max(path["log_ratio"] for path in elite)
+        observed = [0.0] * len(RANDOM_EVENTS)
+        expected = [0.0] * len(RANDOM_EVENTS)
+        for path in elite:
+            weight = math.exp(path["log_ratio"] - max_log_ratio)
+            for i in range(len(RANDOM_EVENTS)):
+                observed[i] += weight * path["event_counts"][i]
+                expected[i] += weight * path["expected_counts"][i]
+
+        tilt_factors = [max(min_tilt, smoothing * (o / e if e > 0 else 1.0) + (1 - smoothing) * t)
+                        for o, e, t in zip(observed, expected, tilt_factors)]
+
+        if level >= 1.0:
+            break
+
+    return {name: factor for (name, _, _), factor in zip(RANDOM_EVENTS, tilt_factors)}
+
+
+def estimate_game_over_probability(policy_plan, n_samples=10000, tilt=None, state=None, start_round=1,
+                                   max_rounds=10, economic_health=None, targets=None, confidence=0.95,
+                                   rng=None):
+    # 重要性抽样估计游戏失败概率：放大危机事件的抽样权重，再用似然比 p/q
+    # 对每条路径加权，使稀有失败路径也能被充分抽到而估计保持无偏。
+    # policy_plan 为 [(货币政策, 财政政策), ...]，从 start_round 起每回合一项；
+    # tilt 为 {事件名: 倍数}，为 None 时先用交叉熵法自动拟合。
+    state = dict(INITIAL_STATE if state is None else state)
+    targets = DEFAULT_ECONOMIC_TARGETS if targets is None else targets
+    rng = random.Random() if rng is None else rng
+
+    rounds = max_rounds - start_round + 1
+    if rounds < 1:
+        raise ValueError("没有剩余回合可供评估")
+    if len(policy_plan) < rounds:
+        raise ValueError(f"政策计划需要至少 {rounds} 个回合，实际为 {len(policy_plan)}")
+    if n_samples < 2:
+        raise ValueError("样本数至少为2")
+    if not 0 < confidence < 1:
+        raise ValueError(f"置信水平必须介于0和1之间，实际为 {confidence}")
+    policy_plan = list(policy_plan[:rounds])
+    for monetary_policy, fiscal_policy in policy_plan:
+        if monetary_policy not in MONETARY_POLICIES:
+            raise ValueError(f"未知的货币政策: {monetary_policy}")
+        if fiscal_policy not in FISCAL_POLICIES:
+            raise ValueError(f"未知的财政政策: {fiscal_policy}")
+
+    if economic_health is None:
+        economic_health = assess_economic_health(state, targets)[0]
+    if tilt is None:
+        tilt = fit_event_tilt(policy_plan, state, start_round, max_rounds, economic_health, targets, rng)
+
+    event_names = [name for name, _, _ in RANDOM_EVENTS]
+    for name in tilt:
+        if name not in event_names:
+            raise ValueError(f"未知的随机事件: {name}")
+    tilt_factors = [tilt.get(name, 1.0) for name in event_names]
+    if any(factor <= 0 for factor in tilt_factors):
+        raise ValueError("倾斜倍数必须为正数")
+
+    total = 0.0
+    total_sq = 0.0
+    hits = 0
+    causes = {}
+    for _ in range(n_samples):
+        path = simulate_policy_path(policy_plan, state, start_round, max_rounds, economic_health,
+                                    targets, tilt_factors, rng)
+        if path["cause"]:
+            weight = math.exp(path["log_ratio"])
+            total += weight
+            total_sq += weight * weight
+            hits += 1
+            causes[path["cause"]] = causes.get(path["cause"], 0.0) + weight
+
+    probability = total / n_samples
+    variance = max(0.0, (total_sq / n_samples - probability ** 2) * n_samples / (n_samples - 1))
+    std_error = math.sqrt(variance / n_samples)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    return {
+        "probability": probability,
+        "std_error": std_error,
+        "ci_low": max(0.0, probability - z * std_error),
+        "ci_high": min(1.0, probability + z * std_error),
+        "confidence": confidence,
+        "relative_error": std_error / probability if probability > 0 else float("inf"),
+        "effective_sample_size": total * total / total_sq if total_sq > 0 else 0.0,
+        "hits": hits,
+        "n_samples": n_samples,
+        "causes": {cause: weight / n_samples for cause, weight in causes.items()},
+        "tilt": dict(zip((name for name, _, _ in RANDOM_EVENTS), tilt_factors))
+    }
+
+
+def calculate_score(state):
+    score = 0
+
+    inflation_diff = abs(state["inflation_rate"] - 2.0)
+    score += max(0, 20 - inflation_diff * 4)
+
+    if 4.0 <= state["unemployment_rate"] <= 6.0:
+        score += 20
+    else:
+        unemployment_diff = min(abs(state["unemployment_rate"] - 4.0), abs(state["unemployment_rate"] - 6.0))
+        score += max(0, 20 - unemployment_diff * 4)
+
+    if 2.0 <= state["gdp_growth"] <= 4.0:
+        score += 20
+    else:
+        gdp_diff = min(abs(state["gdp_growth"] - 2.0), abs(state["gdp_growth"] - 4.0))
+        score += max(0, 20 - gdp_diff * 10)
+
+    budget_diff = abs(state["budget_balance"])
+    score += max(0, 15 - budget_diff * 1.5)
+
+    if state["popular_support"] >= 70:
+        score += 25
+    else:
+        score += state["popular_support"] * 0.357
+
+    return score
+
+
+class GameArchive:
+    # 本地SQLite对局存档。写入时同步累加按政策、回合和结束原因分组的
+    # 对局数与得分和，统计查询只需读取汇总表中的少数几行，与对局数量无关。
+    INDICATORS = list(INITIAL_STATE)
+
+    def __init__(self, path=ARCHIVE_PATH):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.create_tables()
+
+    def create_tables(self):
+        indicator_columns = ", ".join(f"{attr} REAL" for attr in self.INDICATORS)
+        with self.connection:
+            self.connection.execute(f"""
+                CREATE TABLE IF NOT EXISTS games (
+                    id INTEGER PRIMARY KEY,
+                    played_at TEXT NOT NULL,
+                    settings TEXT NOT NULL,
+                    rounds_played INTEGER NOT NULL,
+                    {indicator_columns},
+                    score REAL NOT NULL,
+                    game_over_cause TEXT NOT NULL
+                )""")
+            self.connection.execute(f"""
+                CREATE TABLE IF NOT EXISTS rounds (
+                    game_id INTEGER NOT NULL REFERENCES games(id),
+                    round INTEGER NOT NULL,
+                    monetary_policy TEXT NOT NULL,
+                    fiscal_policy TEXT NOT NULL,
+                    event TEXT,
+                    {indicator_columns},
+                    score REAL NOT NULL,
+                    game_over_cause TEXT NOT NULL,
+                    PRIMARY KEY (game_id, round)
+                ) WITHOUT ROWID""")
+            # 按 (用过的货币政策, 用过的财政政策, 结束原因) 汇总的对局数与得分和，
+            # 政策为空字符串表示不限该类政策
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS game_statistics (
+                    monetary_policy TEXT NOT NULL,
+                    fiscal_policy TEXT NOT NULL,
+                    game_over_cause TEXT NOT NULL,
+                    games INTEGER NOT NULL,
+                    score_sum REAL NOT NULL,
+                    PRIMARY KEY (monetary_policy, fiscal_policy, game_over_cause)
+                ) WITHOUT ROWID""")
+            # 按 (回合, 该回合货币政策, 该回合财政政策, 结束原因) 汇总，空字符串含义同上
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS round_statistics (
+                    round INTEGER NOT NULL,
+                    monetary_policy TEXT NOT NULL,
+                    fiscal_policy TEXT NOT NULL,
+                    game_over_cause TEXT NOT NULL,
+                    games INTEGER NOT NULL,
+                    score_sum REAL NOT NULL,
+                    PRIMARY KEY (round, monetary_policy, fiscal_policy, game_over_cause)
+                ) WITHOUT ROWID""")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS games_score ON games (score)")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS games_cause ON games (game_over_cause, score)")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS rounds_monetary_policy ON rounds (monetary_policy, round)")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS rounds_fiscal_policy ON rounds (fiscal_policy, round)")
+
+    def record_game(self, game):
+        return self.record_games([game])[0]
+
+    def record_games(self, games):
+        # game: {"settings", "rounds": {回合: policy_effects项}, "final_state", "score", "game_over_cause"}
+        game_ids = []
+        placeholders = ", ".join("?" * len(self.INDICATORS))
+        with self.connection:
+            for game in games:
+                played_at = game.get("played_at") or datetime.now().isoformat(timespec="seconds")
+                cursor = self.connection.execute(
+                    f"INSERT INTO games (played_at, settings, rounds_played, {', '.join(self.INDICATORS)}, "
+                    f"score, game_over_cause) VALUES (?, ?, ?, {placeholders}, ?, ?)",
+                    (played_at, json.dumps(game["settings"], ensure_ascii=False), len(game["rounds"]),
+                     *(game["final_state"][attr] for attr in self.INDICATORS),
+                     game["score"], game["game_over_cause"]))
+                game_id = cursor.lastrowid
+                self.connection.executemany(
+                    f"INSERT INTO rounds (game_id, round, monetary_policy, fiscal_policy, event, "
+                    f"{', '.join(self.INDICATORS)}, score, game_over_cause) "
+                    f"VALUES (?, ?, ?, ?, ?, {placeholders}, ?, ?)",
+                    [(game_id, int(round_number), effects["monetary_policy"], effects["fiscal_policy"],
+                      effects.get("event"), *(effects[attr] for attr in self.INDICATORS),
+                      game["score"], game["game_over_cause"])
+                     for round_number, effects in game["rounds"].items()])
+                monetary_policies = {effects["monetary_policy"] for effects in game["rounds"].values()} | {""}
+                fiscal_policies = {effects["fiscal_policy"] for effects in game["rounds"].values()} | {""}
+                self.connection.executemany(
+                    "INSERT INTO game_statistics (monetary_policy, fiscal_policy, game_over_cause, games, "
+                    "score_sum) VALUES (?, ?, ?, 1, ?) "
+                    "ON CONFLICT (monetary_policy, fiscal_policy, game_over_cause) DO UPDATE SET "
+                    "games = games + 1, score_sum = score_sum + excluded.score_sum",
+                    [(monetary_policy, fiscal_policy, game["game_over_cause"], game["score"])
+                     for monetary_policy in monetary_policies for fiscal_policy in fiscal_policies])
+                self.connection.executemany(
+                    "INSERT INTO round_statistics (round, monetary_policy, fiscal_policy, game_over_cause, "
+                    "games, score_sum) VALUES (?, ?, ?, ?, 1, ?) "
+                    "ON CONFLICT (round, monetary_policy, fiscal_policy, game_over_cause) DO UPDATE SET "
+                    "games = games + 1, score_sum = score_sum + excluded.score_sum",
+                    [(int(round_number), monetary_policy, fiscal_policy, game["game_over_cause"], game["score"])
+                     for round_number, effects in game["rounds"].items()
+                     for monetary_policy, fiscal_policy in (
+                         (effects["monetary_policy"], effects["fiscal_policy"]),
+                         (effects["monetary_policy"], ""), ("", effects["fiscal_policy"]))])
+                game_ids.append(game_id)
+        return game_ids
+
+    def average_score(self, monetary_policy=None, fiscal_policy=None, round_number=None,
+                      game_over_cause=None):
+        # 返回 (平均得分, 对局数)。指定 round_number 时只看该回合的政策，
+        # 否则统计在任一回合使用过该政策的对局。
+        query = "SELECT SUM(score_sum) / SUM(games), COALESCE(SUM(games), 0) FROM "
+        conditions = ["monetary_policy = ?", "fiscal_policy = ?"]
+        params = [monetary_policy or "", fiscal_policy or ""]
+        if round_number is not None:
+            if monetary_policy is None and fiscal_policy is None:
+                raise ValueError("按回合筛选时需要指定货币政策或财政政策")
+            query += "round_statistics"
+            conditions.append("round = ?")
+            params.append(round_number)
+        else:
+            query += "game_statistics"
+
+        if game_over_cause is not None:
+            conditions.append("game_over_cause = ?")
+            params.append(game_over_cause)
+
+        query += " WHERE " + " AND ".join(conditions)
+        return self.connection.execute(query, params).fetchone()
+
+    def score_by_policy(self, kind="monetary", round_number=1):
+        # 各政策在指定回合的 (政策, 平均得分, 对局数)，按平均得分降序
+        if kind not in ("monetary", "fiscal"):
+            raise ValueError(f"未知的政策类型: {kind}")
+        other = "fiscal" if kind == "monetary" else "monetary"
+        return self.connection.execute(
+            f"SELECT {kind}_policy, SUM(score_sum) / SUM(games), SUM(games) FROM round_statistics "
+            f"WHERE round = ? AND {other}_policy = '' "
+            f"GROUP BY {kind}_policy ORDER BY SUM(score_sum) / SUM(games) DESC",
+            (round_number,)).fetchall()
+
+    def game_over_breakdown(self):
+        # 各结束原因的 (原因, 对局数, 平均得分)
+        return self.connection.execute(
+            "SELECT game_over_cause, games, score_sum / games FROM game_statistics "
+            "WHERE monetary_policy = '' AND fiscal_policy = '' ORDER BY games DESC").fetchall()
+
+    def close(self):
+        self.connection.close()
+
 
 class EconomicGame:
     def __init__(self, root):
@@ -55,15 +587,16 @@ class EconomicGame:
         self.popular_support = 50
         self.economic_health = "稳定"
         self.policy_effects = {}
-        self.economic_targets = {
-            "inflation": (1.0, 3.0),
-            "unemployment": (3.0, 6.0),
-            "gdp_growth": (2.0, 4.0),
-            "budget": (-20, 20),
-            "support": (60, 100)
-        }
+        self.economic_targets = dict(DEFAULT_ECONOMIC_TARGETS)
         self.advisors = []
         self.advisor_visible = False
+        self.initial_state = self.current_state()
+
+        try:
+            self.archive = GameArchive()
+        except sqlite3.Error:
+            self.archive = None
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # 初始化历史数据
         self.history = {
@@ -239,6 +772,10 @@ class EconomicGame:
                                          command=self.execute_policy)
         self.execute_button.pack(pady=10, ipady=8)
 
+        self.risk_button = ttk.Button(button_frame, text="风险评估",
+                                      command=self.assess_risk)
+        self.risk_button.pack(pady=(0, 10))
+
         bottom_frame = ttk.LabelFrame(main_frame, text="事件与结果", style="RoundedFrame")
         bottom_frame.grid(row=1, column=0, columnspan=3, sticky="nsew", padx=5, pady=5, ipadx=10, ipady=10)
 
@@ -306,46 +843,15 @@ class EconomicGame:
         self.update_economic_health()
 
     def update_economic_health(self):
-        health_score = 0
-
-        if self.economic_targets["inflation"][0] <= self.inflation_rate <= self.economic_targets["inflation"][1]:
-            health_score += 1
-        elif self.inflation_rate < self.economic_targets["inflation"][0]:
-            health_score -= 0.5
-        else:
-            health_score -= 1
-
-        if self.economic_targets["unemployment"][0] <= self.unemployment_rate <= self.economic_targets["unemployment"][1]:
-            health_score += 1
-        elif self.unemployment_rate > self.economic_targets["unemployment"][1]:
-            health_score -= 1
-
-        if self.economic_targets["gdp_growth"][0] <= self.gdp_growth <= self.economic_targets["gdp_growth"][1]:
-            health_score += 1
-        elif self.gdp_growth < self.economic_targets["gdp_growth"][0]:
-            health_score -= 1
+        self.economic_health, color = assess_economic_health(self.current_state(), self.economic_targets)
+        self.status_indicator.config(text=self.economic_health, background=color)
 
-        if self.economic_targets["budget"][0] <= self.budget_balance <= self.economic_targets["budget"][1]:
-            health_score += 0.5
-        elif self.budget_balance < self.economic_targets["budget"][0]:
-            health_score -= 0.5
+    def current_state(self):
+        return {attr: getattr(self, attr) for attr in INITIAL_STATE}
 
-        if self.popular_support >= self.economic_targets["support"][0]:
-            health_score += 0.5
-        else:
-            health_score -= 0.5
-
-        if health_score >= 3:
-            self.economic_health = "健康"
-            color = "#27ae60"
-        elif health_score >= 1.5:
-            self.economic_health = "稳定"
-            color = "#f39c12"
-        else:
-            self.economic_health = "衰退"
-            color = "#e74c3c"
-
-        self.status_indicator.config(text=self.economic_health, background=color)
+    def load_state(self, state):
+        for attr, value in state.items():
+            setattr(self, attr, value)
 
     def update_indicators(self):
         self.indicator_labels["inflation_rate"].config(text=f"{self.inflation_rate:.1f}")
@@ -439,83 +945,15 @@ class EconomicGame:
         self.history["interest"].append(self.interest_rate)
         self.history["gdp"].append(self.gdp_growth)
 
-        monetary_effect = ""
-        if monetary_policy == "提高利率":
-            self.interest_rate += 0.5
-            self.inflation_rate -= 0.7
-            self.unemployment_rate += 0.4
-            self.gdp_growth -= 0.3
-            self.popular_support -= 2
-            monetary_effect = "提高利率 0.5%。这抑制了通货膨胀，但导致失业率上升和经济增长放缓。"
-        elif monetary_policy == "降低利率":
-            self.interest_rate -= 0.5
-            self.inflation_rate += 0.7
-            self.unemployment_rate -= 0.4
-            self.gdp_growth += 0.3
-            self.popular_support += 2
-            monetary_effect = "降低利率 0.5%。这刺激了经济增长和通货膨胀，同时降低了失业率。"
-        elif monetary_policy == "增加货币供应":
-            self.inflation_rate += 1.0
-            self.unemployment_rate -= 0.6
-            self.gdp_growth += 0.5
-            self.popular_support += 3
-            monetary_effect = "增加货币供应。这刺激了经济增长，降低了失业率，但加剧了通货膨胀。"
-        elif monetary_policy == "减少货币供应":
-            self.inflation_rate -= 1.0
-            self.unemployment_rate += 0.6
-            self.gdp_growth -= 0.5
-            self.popular_support -= 3
-            monetary_effect = "减少货币供应。这抑制了通货膨胀，但导致失业率上升和经济增长放缓。"
-        elif monetary_policy == "量化宽松":
-            self.inflation_rate += 0.8
-            self.unemployment_rate -= 0.5
-            self.gdp_growth += 0.4
-            self.popular_support += 2
-            monetary_effect = "实施量化宽松政策。这增加了市场流动性，刺激了经济增长，但也可能引发通货膨胀。"
-        else:
-            monetary_effect = "保持货币政策不变。"
-
-        fiscal_effect = ""
-        if fiscal_policy == "增加政府支出":
-            self.budget_balance -= 5
-            self.gdp_growth += 0.5
-            self.unemployment_rate -= 0.3
-            self.inflation_rate += 0.5
-            self.popular_support += 3
-            fiscal_effect = "增加政府支出 50 亿。这刺激了经济增长，降低了失业率，但增加了通货膨胀和预算赤字。"
-        elif fiscal_policy == "减少政府支出":
-            self.budget_balance += 5
-            self.gdp_growth -= 0.5
-            self.unemployment_rate += 0.3
-            self.inflation_rate -= 0.5
-            self.popular_support -= 3
-            fiscal_effect = "减少政府支出 50 亿。这减少了预算赤字和通货膨胀，但导致经济增长放缓和失业率上升。"
-        elif fiscal_policy == "增加税收":
-            self.budget_balance += 7
-            self.gdp_growth -= 0.4
-            self.inflation_rate -= 0.4
-            self.popular_support -= 4
-            fiscal_effect = "增加税收 70 亿。这增加了预算盈余并抑制了通货膨胀，但导致经济增长放缓。"
-        elif fiscal_policy == "减少税收":
-            self.budget_balance -= 7
-            self.gdp_growth += 0.4
-            self.inflation_rate += 0.4
-            self.popular_support += 4
-            fiscal_effect = "减少税收 70 亿。这刺激了经济增长和通货膨胀，但增加了预算赤字。"
-        elif fiscal_policy == "结构性减税":
-            self.budget_balance -= 3
-            self.gdp_growth += 0.3
-            self.unemployment_rate -= 0.2
-            self.popular_support += 2
-            fiscal_effect = "实施结构性减税。这促进了特定产业的发展，提高了生产效率，对经济增长和就业有积极影响。"
-        else:
-            fiscal_effect = "保持财政政策不变。"
+        monetary_effect = MONETARY_POLICIES[monetary_policy][1]
+        fiscal_effect = FISCAL_POLICIES[fiscal_policy][1]
 
-        phillips_effect = random.uniform(-0.3, 0.3)
-        self.inflation_rate += phillips_effect
-        self.unemployment_rate -= phillips_effect * 0.5
+        state = self.current_state()
+        event_index, _, _ = play_round(state, self.economic_health, monetary_policy, fiscal_policy, random)
+        self.load_state(state)
 
-        random_event, event_effect = self.generate_random_event()
+        random_event, event_effect, _ = RANDOM_EVENTS[event_index]
+        self.policy_effects[self.round]['event'] = random_event
 
         result_text = (f"第 {self.round} 回合结果:\n"
                        f"========================================\n"
@@ -556,94 +994,88 @@ class EconomicGame:
         self.round += 1
         if self.round > self.max_rounds:
             self.execute_button.config(text="游戏结束", state=tk.DISABLED)
+            self.risk_button.config(state=tk.DISABLED)
+            self.archive_game("完成")
             self.show_game_results()
         else:
-            if self.popular_support <= 0:
+            cause = round_game_over_cause(self.current_state(), self.round - 1, self.max_rounds)
+            if cause:
+                self.archive_game(cause)
+
+            if cause == "支持率归零":
                 self.execute_button.config(text="游戏结束", state=tk.DISABLED)
+                self.risk_button.config(state=tk.DISABLED)
                 messagebox.showinfo("游戏结束", "你的民众支持率已降至0！\n\n你失去了职位。")
-            elif self.inflation_rate > 15 or self.unemployment_rate > 15:
+            elif cause == "经济衰退":
                 self.execute_button.config(text="游戏结束", state=tk.DISABLED)
+                self.risk_button.config(state=tk.DISABLED)
                 messagebox.showinfo("游戏结束", "经济陷入严重衰退！\n\n你被解职了。")
 
-    def generate_random_event(self):
-        events = [
-            ("国际油价上涨", "这导致国内能源价格上升，推高了通货膨胀率。",
-             {"inflation_rate": 1.2, "gdp_growth": -0.3}),
-            ("技术突破", "这提高了生产效率，促进了经济增长并降低了失业率。",
-             {"gdp_growth": 0.8, "unemployment_rate": -0.5}),
-            ("贸易战升级", "这阻碍了国际贸易，导致经济增长放缓。",
-             {"gdp_growth": -0.6, "inflation_rate": 0.5}),
-            ("消费者信心增强", "这刺激了消费，促进了经济增长。",
-             {"gdp_growth": 0.7, "unemployment_rate": -0.3}),
-            ("自然灾害", "这破坏了基础设施，导致经济增长放缓。",
-             {"gdp_growth": -0.5, "budget_balance": -3}),
-            ("央行注入流动性", "这降低了市场利率，刺激了投资。",
-             {"interest_rate": -0.4, "gdp_growth": 0.4}),
-            ("房地产市场繁荣", "这刺激了相关产业，促进了经济增长。",
-             {"gdp_growth": 0.6, "inflation_rate": 0.4}),
-            ("股市崩盘", "这导致消费者信心下降，经济增长放缓。",
-             {"gdp_growth": -0.7, "popular_support": -5}),
-            ("金融危机", "这导致信贷紧缩，经济增长停滞。",
-             {"gdp_growth": -1.0, "unemployment_rate": 1.0}),
-            ("全球疫情爆发", "这导致供应链中断，经济增长大幅放缓。",
-             {"gdp_growth": -1.5, "unemployment_rate": 1.5, "popular_support": -8}),
-            ("汇率波动", "本币升值影响出口，导致贸易收支变化。",
-             {"gdp_growth": -0.2}),
-            ("新兴市场危机", "全球资本流动变化，影响国内金融市场。",
-             {"interest_rate": 0.5, "budget_balance": -1}),
-            ("无事件", "本回合经济运行平稳，没有重大事件发生。", {})
-        ]
-
-        event_weights = [1.0] * len(events)
-
-        if self.economic_health == "衰退":
-            event_weights[0] = 1.5
-            event_weights[2] = 1.5
-            event_weights[4] = 1.5
-            event_weights[7] = 1.5
-            event_weights[8] = 1.5
-            event_weights[9] = 1.2
-            event_weights[10] = 0.8
-            event_weights[11] = 1.3
-        elif self.inflation_rate > 5:
-            event_weights[0] = 1.5
-            event_weights[2] = 1.2
-            event_weights[5] = 0.8
-
-        event_name, event_description, effects = random.choices(events, weights=event_weights, k=1)[0]
+    def assess_risk(self):
+        if self.round > self.max_rounds:
+            messagebox.showinfo("风险评估", "所有回合已完成！")
+            return
 
-        for attr, value in effects.items():
-            current_value = getattr(self, attr, None)
-            if current_value is not None:
-                setattr(self, attr, current_value + value)
+        # 假设剩余回合一直采用当前选择的政策
+        monetary_policy = self.monetary_var.get()
+        fiscal_policy = self.fiscal_var.get()
+        policy_plan = [(monetary_policy, fiscal_policy)] * (self.max_rounds - self.round + 1)
+
+        # 评估需要数秒，期间禁用按钮并显示忙碌光标
+        self.execute_button.config(state=tk.DISABLED)
+        self.risk_button.config(state=tk.DISABLED)
+        self.root.config(cursor="watch")
+        self.root.update_idletasks()
+        try:
+            result = estimate_game_over_probability(policy_plan, n_samples=RISK_ASSESSMENT_SAMPLES,
+                                                    state=self.current_state(), start_round=self.round,
+                                                    max_rounds=self.max_rounds,
+                                                    economic_health=self.economic_health,
+                                                    targets=self.economic_targets)
+        finally:
+            # 先在按钮禁用时处理掉评估期间排队的点击，再恢复按钮
+            self.root.update()
+            self.root.config(cursor="")
+            self.execute_button.config(state=tk.NORMAL)
+            self.risk_button.config(state=tk.NORMAL)
+
+        risk_text = (f"若剩余回合持续执行「{monetary_policy}」与「{fiscal_policy}」：\n\n"
+                     f"游戏失败概率: {result['probability']:.4%}\n"
+                     f"{result['confidence']:.0%}置信区间: "
+                     f"{result['ci_low']:.4%} - {result['ci_high']:.4%}\n")
+        for cause, probability in result["causes"].items():
+            risk_text += f"- {cause}: {probability:.4%}\n"
+        risk_text += f"\n样本数: {result['n_samples']}，有效样本数: {result['effective_sample_size']:.0f}"
+
+        messagebox.showinfo("风险评估", risk_text)
+
+    def archive_game(self, cause):
+        if self.archive is None:
+            return
 
-        return event_name, event_description
+        # 存档失败不应影响结算，只提示玩家
+        try:
+            self.archive.record_game({
+                "settings": {
+                    "max_rounds": self.max_rounds,
+                    "initial_state": self.initial_state,
+                    "economic_targets": self.economic_targets
+                },
+                "rounds": self.policy_effects,
+                "final_state": self.current_state(),
+                "score": calculate_score(self.current_state()),
+                "game_over_cause": cause
+            })
+        except sqlite3.Error as error:
+            messagebox.showwarning("存档失败", f"本局结果未能保存：{error}")
+
+    def on_close(self):
+        if self.archive is not None:
+            self.archive.close()
+        self.root.destroy()
 
     def show_game_results(self):
-        score = 0
-
-        inflation_diff = abs(self.inflation_rate - 2.0)
-        score += max(0, 20 - inflation_diff * 4)
-
-        if 4.0 <= self.unemployment_rate <= 6.0:
-            score += 20
-        else:
-            unemployment_diff = min(abs(self.unemployment_rate - 4.0), abs(self.unemployment_rate - 6.0))
-            score += max(0, 20 - unemployment_diff * 4)
-
-        if 2.0 <= self.gdp_growth <= 4.0:
-            score += 20
-        else:
-            gdp_diff = min(abs(self.gdp_growth - 2.0), abs(self.gdp_growth - 4.0))
-            score += max(0, 20 - gdp_diff * 10)
-
-        budget_diff = abs(self.budget_balance)
-        score += max(0, 15 - budget_diff * 1.5)
-
-        if self.popular_support >= 70:
-            score += 25
-        else:
-            score += self.popular_support * 0.357
+        score = calculate_score(self.current_state())
 
         final_stats = (f"最终经济指标:\n"
                        f"- 通货膨胀率: {self.inflation_rate:.1f}%\n"